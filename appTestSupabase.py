@@ -7,12 +7,28 @@ Version: 1.3
 """
 
 import streamlit as st
+import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from supabase import create_client, Client
+import httpx
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from supabase import create_client, Client, ClientOptions
+from postgrest.exceptions import APIError
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+import csv
+import functools
+import gzip
+import hashlib
+import io
 import json
+import logging
+import mimetypes
+import os
+import threading
+import time
+from operator import itemgetter
+from urllib.parse import urlencode
 
 # =============================================================================
 # CONFIGURATION
@@ -184,15 +200,35 @@ st.markdown("""
 # SUPABASE CONFIG
 # =============================================================================
 
-SUPABASE_URL = st.secrets.get("SUPABASE_URL", "")
-SUPABASE_KEY = st.secrets.get("SUPABASE_KEY", "")
+def supabase_client_alive(client) -> bool:
+    # Validation à chaque accès au cache : un client dont la session HTTP a été fermée est reconstruit
+    return client is None or not client.postgrest.session.is_closed
 
-@st.cache_resource
+# Délais des appels Supabase (s) ; Storage plus large pour les uploads
+POSTGREST_TIMEOUT_S = 10
+STORAGE_TIMEOUT_S = 30
+
+def build_supabase_client(supabase_url: str, supabase_key: str) -> Client:
+    # Pas de client httpx injecté via ClientOptions(httpx_client=...) : supabase-py le partage avec
+    # Storage, qui réécrit sa base_url en /storage/v1/ (2.16), ou le passe à PostgREST sans base_url
+    # ni en-têtes apikey/Authorization (2.32). Chaque service garde sa propre session keep-alive,
+    # réutilisée d'un rerun à l'autre puisque le client est mis en cache par process.
+    # Délais bornés : une requête bloquée ne fige pas le thread du script
+    options = ClientOptions(
+        postgrest_client_timeout=POSTGREST_TIMEOUT_S,
+        storage_client_timeout=STORAGE_TIMEOUT_S,
+    )
+    return create_client(supabase_url, supabase_key, options=options)
+
+@st.cache_resource(validate=supabase_client_alive)
 def get_supabase_client():
-    if not SUPABASE_KEY or not SUPABASE_URL:
+    # Secrets lus uniquement à la construction du client, pas à chaque rerun du script
+    supabase_url = st.secrets.get("SUPABASE_URL", "")
+    supabase_key = st.secrets.get("SUPABASE_KEY", "")
+    if not supabase_key or not supabase_url:
         return None
     try:
-        return create_client(SUPABASE_URL, SUPABASE_KEY)
+        return build_supabase_client(supabase_url, supabase_key)
     except Exception as e:
         st.error(f"Erreur connexion Supabase: {e}")
         return None
@@ -200,49 +236,277 @@ def get_supabase_client():
 def get_supabase():
     return get_supabase_client()
 
+# =============================================================================
+# CACHE METRICS
+# =============================================================================
+
+logger = logging.getLogger(__name__)
+
+@st.cache_resource
+def get_cache_metrics():
+    return {}
+
+@st.cache_resource
+def get_cache_metrics_lock():
+    # Les compteurs sont aussi incrémentés depuis les threads de préchargement
+    return threading.Lock()
+
+def tracked_cache_data(**cache_kwargs):
+    """st.cache_data + compteurs d'appels / exécutions réelles par fonction."""
+    def decorator(func):
+        def record(key, value):
+            with get_cache_metrics_lock():
+                stats = get_cache_metrics().setdefault(func.__name__, {"calls": 0, "misses": 0, "miss_ms": 0.0})
+                stats[key] += value
+
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record("misses", 1)
+                record("miss_ms", (time.perf_counter() - start) * 1000)
+
+        cached = st.cache_data(**cache_kwargs)(compute)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            record("calls", 1)
+            return cached(*args, **kwargs)
+
+        wrapper.clear = cached.clear
+        return wrapper
+    return decorator
+
 # =============================================================================
 # DATA LOADING
 # =============================================================================
 
-@st.cache_data(ttl=60)
-def load_table_safe(table_name: str, limit: int = 1000):
-    supabase = get_supabase()
-    if not supabase:
-        return pd.DataFrame()
+# Durées de cache par volatilité : les tables bougent peu entre deux écritures de l'app
+# (invalidées explicitement, cf. invalidate_table_caches), les listings Storage changent souvent
+TABLE_CACHE_TTL = 300
+STORAGE_CACHE_TTL = 30
+SCHEMA_CACHE_TTL = 3600
+
+def build_query_path(table_name: str, columns: str = "*", limit: int = 1000, offset: int = 0):
+    # Chemin relatif à la base_url de la session PostgREST (.../rest/v1/)
+    params = {"select": columns, "limit": limit}
+    if offset:
+        params["offset"] = offset
+    return f"{table_name}?" + urlencode(params, safe="*,")
+
+def fetch_rows(client: Client, table_name: str, columns: str = "*", limit: int = 1000, page: int = 1, count: str = None):
+    """Renvoie (lignes, total) pour une page ; total vaut None si `count` n'est pas demandé.
+
+    Pas de cache ni d'appel Streamlit ici : la fonction peut tourner dans un worker.
+    Les erreurs (httpx.HTTPError) remontent à l'appelant, qui les affiche ; un échec n'est pas mis en cache.
+    """
+    # GET direct sur la session httpx de PostgREST, sans passer par le query builder supabase-py
+    headers = {"Prefer": f"count={count}"} if count else None
+    response = client.postgrest.session.get(
+        build_query_path(table_name, columns, limit, (page - 1) * limit), headers=headers
+    )
+    response.raise_for_status()
+    # Content-Range: 0-99/1234
+    total = response.headers.get("content-range", "").rpartition("/")[2]
+    return response.json(), int(total) if total.isdigit() else None
+
+@tracked_cache_data(ttl=TABLE_CACHE_TTL, show_spinner="Chargement…")
+def query_table(_client: Client, table_name: str, columns: str = "*", limit: int = 1000, page: int = 1, count: str = None):
+    if not _client:
+        return [], None
+    return fetch_rows(_client, table_name, columns, limit, page, count)
+
+@tracked_cache_data(ttl=TABLE_CACHE_TTL, show_spinner=False)
+def export_table_csv(_client: Client, table_name: str, columns: str, limit: int, page: int, compress: bool = False) -> bytes:
+    # Export mis en cache par page de requête : un second clic (ou l'autre format) ne resérialise pas
+    rows, _ = query_table(_client, table_name, columns, limit, page, count="planned")
+    return csv_bytes(rows, compress)
+
+# CSV PostgREST (représentation texte des lignes Postgres) : seul un champ vide non quoté est NULL.
+# "" reste une chaîne vide et "NA", "null", "nan"... restent des chaînes, comme dans le JSON ;
+# booléens écrits t/f
+CSV_CONVERT_KWARGS = dict(
+    null_values=[""], strings_can_be_null=True, quoted_strings_can_be_null=False,
+    true_values=["t"], false_values=["f"],
+)
+CSV_ARROW_TYPES = {"boolean": pa.bool_(), "text": pa.string()}
+# Formats OpenAPI des colonnes json : leur texte CSV n'est pas décodé, ces tables passent par le JSON
+PG_JSON_FORMATS = {"json", "jsonb"}
+
+def csv_column_kinds(definitions: dict) -> dict:
+    """Nature des colonnes de chaque table d'après les `definitions` OpenAPI de PostgREST.
+
+    "boolean" et "text" (toute colonne chaîne en JSON : texte, uuid, dates, timestamps) sont
+    forcées au parsing CSV ; "json" (json/jsonb, tableaux) envoie la table sur le chemin JSON.
+    Les colonnes numériques restent inférées.
+    """
+    kinds = {}
+    for table_name, definition in definitions.items():
+        for column, prop in definition.get("properties", {}).items():
+            if prop.get("type") == "array" or prop.get("format") in PG_JSON_FORMATS:
+                kind = "json"
+            elif prop.get("type") == "boolean":
+                kind = "boolean"
+            elif prop.get("type") == "string":
+                kind = "text"
+            else:
+                continue
+            kinds.setdefault(table_name, {})[column] = kind
+    return kinds
+
+@tracked_cache_data(ttl=SCHEMA_CACHE_TTL, show_spinner=False)
+def get_csv_column_types(_client: Client) -> dict:
+    """Nature des colonnes de chaque table (cf. csv_column_kinds), via la description OpenAPI de PostgREST."""
     try:
-        response = supabase.table(table_name).select("*").limit(limit).execute()
-        return pd.DataFrame(response.data)
-    except:
+        response = _client.postgrest.session.get("", headers={"Accept": "application/openapi+json"})
+        response.raise_for_status()
+        return csv_column_kinds(response.json().get("definitions", {}))
+    except (httpx.HTTPError, ValueError):
+        return {}
+
+def fetch_frame(client: Client, table_name: str, limit: int = 1000, column_types: dict = None) -> pd.DataFrame:
+    """Charge une table en DataFrame à partir de la réponse CSV de PostgREST.
+
+    Parsing colonnaire par pyarrow, sans liste de dicts intermédiaire, avec les mêmes dtypes
+    que le chemin JSON : booléens en bool, colonnes chaîne (dates comprises) en str.
+    Les tables à colonnes json/tableaux passent par le JSON, comme les CSV qui ne se parsent pas.
+    Sans description OpenAPI (`column_types` vide), les types sont inférés : les timestamps
+    deviennent alors des datetime64. Les erreurs HTTP remontent.
+    """
+    column_types = column_types or {}
+    if "json" not in column_types.values():
+        response = client.postgrest.session.get(
+            build_query_path(table_name, limit=limit), headers={"Accept": "text/csv"}
+        )
+        response.raise_for_status()
+        try:
+            convert_options = pa_csv.ConvertOptions(
+                column_types={c: CSV_ARROW_TYPES[t] for c, t in column_types.items()}, **CSV_CONVERT_KWARGS
+            )
+            return pa_csv.read_csv(io.BytesIO(response.content), convert_options=convert_options).to_pandas()
+        except pa.ArrowInvalid:
+            pass
+    rows, _ = fetch_rows(client, table_name, limit=limit)
+    return pd.DataFrame(rows)
+
+@tracked_cache_data(ttl=TABLE_CACHE_TTL, show_spinner="Chargement…")
+def query_frame(_client: Client, table_name: str, limit: int = 1000) -> pd.DataFrame:
+    if not _client:
         return pd.DataFrame()
+    return fetch_frame(_client, table_name, limit, get_csv_column_types(_client).get(table_name))
 
-def load_dashboard_summary():
-    return load_table_safe("mv_dashboard_summary")
+def load_table_safe(supabase: Client, table_name: str, limit: int = 1000):
+    try:
+        return query_frame(supabase, table_name, limit)
+    except httpx.HTTPError as e:
+        st.error(f"Erreur de chargement de `{table_name}`: {e}")
+        return pd.DataFrame()
 
-def load_source_health():
-    return load_table_safe("mv_source_health_score")
+def load_issues(supabase: Client):
+    return load_table_safe(supabase, "dq_issue_detail", 500)
 
-def load_issues():
-    return load_table_safe("dq_issue_detail", 500)
+def load_corrections(supabase: Client):
+    return load_table_safe(supabase, "dq_correction", 500)
 
-def load_data_sources():
-    return load_table_safe("data_source")
+# Tables du dashboard et leur limite de lignes
+DASHBOARD_TABLES = {
+    "mv_dashboard_summary": 1000,
+    "mv_source_health_score": 1000,
+    "data_source": 1000,
+    "dq_correction": 500,
+    "dq_measurement": 1000,
+    "dq_issue_detail": 500,
+}
 
-def load_measurements():
-    return load_table_safe("dq_measurement", 1000)
+# Un seul aller-retour PostgREST pour tout le dashboard, via la fonction SQL :
+#   create or replace function dashboard_bundle() returns jsonb language sql stable as $$
+#     select jsonb_build_object(
+#       'mv_dashboard_summary',   (select jsonb_agg(t) from (select * from mv_dashboard_summary limit 1000) t),
+#       'mv_source_health_score', (select jsonb_agg(t) from (select * from mv_source_health_score limit 1000) t),
+#       'data_source',            (select jsonb_agg(t) from (select * from data_source limit 1000) t),
+#       'dq_correction',          (select jsonb_agg(t) from (select * from dq_correction limit 500) t),
+#       'dq_measurement',         (select jsonb_agg(t) from (select * from dq_measurement limit 1000) t),
+#       'dq_issue_detail',        (select jsonb_agg(t) from (select * from dq_issue_detail limit 500) t)
+#     )
+#   $$;
+@tracked_cache_data(ttl=TABLE_CACHE_TTL)
+def load_dashboard_bundle(_client: Client):
+    if not _client:
+        return {}
+    try:
+        return _client.rpc("dashboard_bundle").execute().data or {}
+    except (APIError, httpx.HTTPError) as e:
+        # RPC absente (ou en échec) : les tables sont indépendantes, elles sont chargées en parallèle
+        logger.warning("RPC dashboard_bundle indisponible, chargement table par table : %s", e)
+        futures = {
+            table_name: get_executor().submit(fetch_rows, _client, table_name, limit=limit)
+            for table_name, limit in DASHBOARD_TABLES.items()
+        }
+        bundle = {}
+        for table_name, future in futures.items():
+            try:
+                bundle[table_name] = future.result()[0]
+            except httpx.HTTPError:
+                pass  # Table absente du bundle : load_from_bundle la recharge et affiche l'erreur
+        return bundle
 
-def load_corrections():
-    return load_table_safe("dq_correction", 500)
+def load_from_bundle(supabase: Client, bundle: dict, table_name: str):
+    # Repli sur une requête par table si la fonction RPC n'est pas déployée
+    if table_name in bundle:
+        return pd.DataFrame(bundle[table_name] or [])
+    return load_table_safe(supabase, table_name, DASHBOARD_TABLES[table_name])
 
-@st.cache_data(ttl=300)
-def get_table_list():
+@tracked_cache_data(ttl=STORAGE_CACHE_TTL, show_spinner=False)
+def get_bucket_files(_client: Client, bucket_name: str, path: str = ""):
+    # Les exceptions ne sont pas mises en cache : l'appelant les affiche.
+    # Seuls les champs affichés sont gardés, à plat : entrée de cache plus légère à (dé)sérialiser.
     return [
-        "data_source", "dq_rule_type", "dq_rule", "dq_field_ref",
-        "dq_run", "dq_measurement", "dq_field_check", "dq_issue_detail",
-        "dq_correction", "dq_audit_log",
-        "mv_dashboard_summary", "mv_correction_review_queue", 
-        "mv_source_health_score", "mv_field_quality_trend", "mv_rule_effectiveness"
+        {"name": f.get("name"), "id": f.get("id"), "created_at": f.get("created_at"), "size": (f.get("metadata") or {}).get("size")}
+        for f in _client.storage.from_(bucket_name).list(path)
     ]
 
+DEFAULT_BUCKET = "bucketprimelab"
+STORAGE_PREFETCH_LIMIT = 8
+STORAGE_PREFETCH_HISTORY = 256
+STORAGE_PAGE_SIZE = 100
+
+def prefetch_bucket_folders(client: Client, bucket_name: str, folder_paths):
+    # Listings des premiers sous-dossiers chargés en parallèle : la navigation suivante tombe dans le cache
+    for folder_path in folder_paths[:STORAGE_PREFETCH_LIMIT]:
+        submit_background(get_bucket_files, client, bucket_name, folder_path)
+
+# Liste de repli si la fonction get_public_tables_meta n'est pas déployée
+TABLE_NAMES = (
+    "data_source", "dq_rule_type", "dq_rule", "dq_field_ref",
+    "dq_run", "dq_measurement", "dq_field_check", "dq_issue_detail",
+    "dq_correction", "dq_audit_log",
+    "mv_dashboard_summary", "mv_correction_review_queue", 
+    "mv_source_health_score", "mv_field_quality_trend", "mv_rule_effectiveness"
+)
+
+# Tables/vues matérialisées et estimation du nombre de lignes en un seul appel :
+#   create or replace function get_public_tables_meta() returns table(table_name text, est_rows bigint)
+#   language sql stable as $$
+#     select relname::text, greatest(reltuples, 0)::bigint from pg_class
+#     where relnamespace = 'public'::regnamespace and relkind in ('r', 'm')
+#     order by relname
+#   $$;
+@tracked_cache_data(ttl=SCHEMA_CACHE_TTL, show_spinner=False)
+def get_tables_meta(_client: Client) -> dict:
+    if _client:
+        try:
+            rows = _client.rpc("get_public_tables_meta").execute().data
+            if rows:
+                return {row["table_name"]: row["est_rows"] for row in rows}
+        except:
+            pass
+    return dict.fromkeys(TABLE_NAMES)
+
+def get_table_list(supabase: Client):
+    return list(get_tables_meta(supabase))
+
 # =============================================================================
 # HELPERS
 # =============================================================================
@@ -254,7 +518,110 @@ def get_status_emoji(status):
     return {"ok": "🟢", "warning": "🟡", "critical": "🔴", "pending": "⏳", 
             "validated": "✅", "rejected": "❌", "open": "🔵", "escalated": "🚨", "resolved": "✅"}.get(status, "⚪")
 
-def render_health_bar(score: float, label: str):
+SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
+
+def format_file_size(size_bytes: int = None) -> str:
+    if size_bytes is None:
+        return "-"
+    size_bytes = int(size_bytes)
+    # bit_length() donne log2 directement : unité choisie sans boucle de divisions
+    unit_idx = min(max(size_bytes.bit_length() - 1, 0) // 10, 4)
+    return f"{size_bytes / (1 << (unit_idx * 10)):.1f} {SIZE_UNITS[unit_idx]}"
+
+def format_file_sizes(sizes: np.ndarray) -> list:
+    # Unité choisie pour tout le tableau en une passe : log2(taille) // 10 -> B, KB, MB...
+    unit_idx = np.clip(np.log2(np.maximum(sizes, 1)) // 10, 0, 4).astype(int)
+    scaled = sizes / (1024.0 ** unit_idx)
+    return [f"{value:.1f} {unit}" for value, unit in zip(scaled, np.asarray(SIZE_UNITS)[unit_idx])]
+
+def format_datetimes(dt_strings) -> pd.Series:
+    # Dates ISO 8601 (suffixe "Z" inclus) parsées et formatées en une seule passe vectorisée ; "-" si absente/invalide
+    parsed = pd.to_datetime(pd.Series(dt_strings, dtype=object), format="ISO8601", utc=True, errors="coerce")
+    return parsed.dt.strftime("%Y-%m-%d %H:%M").fillna("-")
+
+@functools.lru_cache(maxsize=1024)
+def mime_from_extension(ext: str) -> str:
+    return mimetypes.guess_type(f"x{ext}")[0] or "application/octet-stream"
+
+def upload_mime_type(uploaded_file) -> str:
+    # Type fourni par le navigateur, sinon déduit de l'extension (mémoïsé par extension)
+    return uploaded_file.type or mime_from_extension(os.path.splitext(uploaded_file.name)[1].lower())
+
+def build_upload_plan(uploaded_files, folder: str):
+    """Liste de (fichier, chemin cible, type MIME) pour l'aperçu et l'upload."""
+    prefix = f"{folder.strip('/')}/" if folder.strip("/") else ""
+    return [(f, f"{prefix}{f.name}", upload_mime_type(f)) for f in uploaded_files]
+
+def render_cache_stats():
+    with st.sidebar.expander("🧮 Cache stats"):
+        rows = []
+        for name, stats in get_cache_metrics().items():
+            hits = stats["calls"] - stats["misses"]
+            rows.append({
+                "Fonction": name,
+                "Appels": stats["calls"],
+                "Hits": hits,
+                "Misses": stats["misses"],
+                "Hit ratio": hits / stats["calls"] if stats["calls"] else 0.0,
+                "Calcul moyen (ms)": stats["miss_ms"] / stats["misses"] if stats["misses"] else 0.0,
+            })
+        if not rows:
+            st.caption("Aucun appel en cache pour l'instant.")
+            return
+        df_stats = pd.DataFrame(rows)
+        st.dataframe(
+            df_stats.style.map(lambda v: "color: #ef4444; font-weight: 700;" if v < 0.2 else "", subset=["Hit ratio"])
+                          .format({"Hit ratio": "{:.0%}", "Calcul moyen (ms)": "{:.1f}"}),
+            use_container_width=True, hide_index=True
+        )
+
+@st.cache_resource
+def get_executor():
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="dq-worker")
+
+@st.cache_resource
+def get_background_executor():
+    # Préchargements sans attente de résultat : pool séparé et réduit, une rafale de préchargements
+    # d'une session ne retarde jamais les chargements attendus (get_executor) des autres sessions
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="dq-prefetch")
+
+def log_background_error(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.warning("Préchargement en arrière-plan en échec", exc_info=future.exception())
+
+def submit_background(fn, *args):
+    # Personne n'attend le future : ses erreurs sont journalisées plutôt que perdues
+    get_background_executor().submit(fn, *args).add_done_callback(log_background_error)
+
+def csv_chunks(df: pd.DataFrame, rows_per_chunk: int = 10_000):
+    yield df.iloc[:0].to_csv(index=False).encode("utf-8")
+    for start in range(0, len(df), rows_per_chunk):
+        yield df.iloc[start:start + rows_per_chunk].to_csv(index=False, header=False).encode("utf-8")
+
+def csv_bytes(data, compress: bool = False) -> bytes:
+    """Sérialise en CSV un DataFrame ou la liste de dicts brute renvoyée par Supabase.
+
+    Avec `compress=True`, le CSV est gzippé à la volée (niveau 1 : quasi gratuit en CPU).
+    """
+    buffer = io.BytesIO()
+    target = gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=1) if compress else buffer
+    if isinstance(data, pd.DataFrame):
+        # Écriture par blocs : jamais de chaîne CSV complète + sa copie encodée en mémoire
+        for chunk in csv_chunks(data):
+            target.write(chunk)
+    else:
+        # Liste de dicts PostgREST : écrite directement, sans DataFrame intermédiaire
+        text = io.TextIOWrapper(target, encoding="utf-8", newline="")
+        writer = csv.DictWriter(text, fieldnames=list(data[0]) if data else [])
+        writer.writeheader()
+        writer.writerows(data)
+        text.flush()
+        text.detach()
+    if compress:
+        target.close()
+    return buffer.getvalue()
+
+def health_bar_html(score: float, label: str) -> str:
     if pd.isna(score):
         score = 0
     score = float(score)
@@ -266,7 +633,7 @@ def render_health_bar(score: float, label: str):
     else:
         color = "#ef4444"  # Red for critical
     
-    st.markdown(f"""
+    return f"""
     <div style="margin-bottom: 12px;">
         <div style="display: flex; justify-content: space-between; margin-bottom: 6px;">
             <span style="color: #334155; font-weight: 500;">{label}</span>
@@ -276,7 +643,12 @@ def render_health_bar(score: float, label: str):
             <div style="background: linear-gradient(90deg, #0066cc, {color}); width: {min(score, 100)}%; height: 100%; border-radius: 10px; transition: width 0.5s ease;"></div>
         </div>
     </div>
-    """, unsafe_allow_html=True)
+    """
+
+def render_health_bars(scores, labels):
+    # Un seul st.markdown pour toutes les barres plutôt qu'un élément par ligne
+    st.markdown("\n".join(health_bar_html(score, label).strip() for score, label in zip(scores, labels)),
+                unsafe_allow_html=True)
 
 # =============================================================================
 # DEMO DATA
@@ -328,8 +700,15 @@ def get_demo_corrections_data():
 # ACTIONS
 # =============================================================================
 
-def update_correction_status(correction_id: int, status: str, user: str, comment: str = None):
-    supabase = get_supabase()
+def invalidate_table_caches():
+    # Invalidation ciblée après une écriture : seules les lectures de tables sont vidées,
+    # les listings Storage restent chauds
+    query_table.clear()
+    query_frame.clear()
+    export_table_csv.clear()
+    load_dashboard_bundle.clear()
+
+def update_correction_status(supabase: Client, correction_id: int, status: str, user: str, comment: str = None):
     if not supabase:
         st.info("Mode démo: action simulée")
         return True
@@ -343,11 +722,22 @@ def update_correction_status(correction_id: int, status: str, user: str, comment
         st.error(f"Erreur: {e}")
         return False
 
+def upload_file_to_supabase(supabase: Client, bucket_name: str, path: str, data: io.BufferedReader, content_type: str):
+    """Renvoie (chemin, message d'erreur ou None) ; appelé depuis les workers d'upload.
+
+    `data` est un flux : storage3 le transmet tel quel à httpx, qui l'envoie sans copie en `bytes`.
+    """
+    try:
+        supabase.storage.from_(bucket_name).upload(path, data, {"content-type": content_type})
+        return path, None
+    except Exception as e:
+        return path, str(e)
+
 # =============================================================================
 # TAB 1: DASHBOARD
 # =============================================================================
 
-def render_dashboard_tab():
+def render_dashboard_tab(supabase: Client):
     # Header with gradient
     st.markdown("""
     <div class="main-header">
@@ -356,11 +746,12 @@ def render_dashboard_tab():
     </div>
     """, unsafe_allow_html=True)
     
-    df_summary = load_dashboard_summary()
-    df_health = load_source_health()
-    df_sources = load_data_sources()
-    df_corrections = load_corrections()
-    df_measurements = load_measurements()
+    bundle = load_dashboard_bundle(supabase)
+    df_summary = load_from_bundle(supabase, bundle, "mv_dashboard_summary")
+    df_health = load_from_bundle(supabase, bundle, "mv_source_health_score")
+    df_sources = load_from_bundle(supabase, bundle, "data_source")
+    df_corrections = load_from_bundle(supabase, bundle, "dq_correction")
+    df_measurements = load_from_bundle(supabase, bundle, "dq_measurement")
     
     demo = get_demo_dashboard_data()
     use_demo = df_summary.empty and df_measurements.empty
@@ -377,7 +768,7 @@ def render_dashboard_tab():
     else:
         overall_score = df_measurements["score"].mean() if not df_measurements.empty and "score" in df_measurements.columns else 0
         total_sources = len(df_sources) if not df_sources.empty else 0
-        df_issues = load_issues()
+        df_issues = load_from_bundle(supabase, bundle, "dq_issue_detail")
         open_issues = len(df_issues[df_issues["status"] == "open"]) if not df_issues.empty and "status" in df_issues.columns else 0
         pending_corrections = len(df_corrections[df_corrections["decision_status"] == "pending"]) if not df_corrections.empty and "decision_status" in df_corrections.columns else 0
         kpis = {"overall_score": overall_score, "total_sources": total_sources, "open_issues": open_issues, "pending_corrections": pending_corrections}
@@ -398,13 +789,13 @@ def render_dashboard_tab():
             domains = df_sources["business_domain"].dropna().unique()
             if len(domains) > 0:
                 domain_data = pd.DataFrame({"domain": domains, "score": [95 + (i % 10) for i in range(len(domains))]})
-        for _, row in domain_data.sort_values("score").iterrows():
-            render_health_bar(row["score"], row["domain"])
+        domain_data = domain_data.sort_values("score")
+        render_health_bars(domain_data["score"], domain_data["domain"])
     
     with col_right:
         st.subheader("📊 Qualité par Type de Règle")
-        for _, row in demo["rules"].sort_values("score").iterrows():
-            render_health_bar(row["score"], row["rule_type"])
+        rules = demo["rules"].sort_values("score")
+        render_health_bars(rules["score"], rules["rule_type"])
     
     st.divider()
     st.subheader("⚠️ Attention Requise")
@@ -414,7 +805,7 @@ def render_dashboard_tab():
 # TAB 2: AI CORRECTIONS
 # =============================================================================
 
-def render_corrections_tab():
+def render_corrections_tab(supabase: Client):
     st.markdown("""
     <div class="main-header">
         <h1>🤖 Corrections IA</h1>
@@ -426,7 +817,7 @@ def render_corrections_tab():
         st.subheader("👤 Utilisateur")
         current_user = st.text_input("Votre identifiant", value="demo.user", key="correction_user")
     
-    df_corrections = load_corrections()
+    df_corrections = load_corrections(supabase)
     if df_corrections.empty:
         st.info("📊 Affichage des données de démonstration")
         df_corrections = get_demo_corrections_data()
@@ -496,15 +887,15 @@ def render_corrections_tab():
             col_btn1, col_btn2, col_btn3 = st.columns(3)
             with col_btn1:
                 if st.button("✅ Accepter", key=f"accept_{correction_id}", type="primary"):
-                    if update_correction_status(correction_id, "validated", current_user):
+                    if update_correction_status(supabase, correction_id, "validated", current_user):
                         st.success("Correction validée !")
-                        st.cache_data.clear()
+                        invalidate_table_caches()
                         st.rerun()
             with col_btn2:
                 if st.button("❌ Rejeter", key=f"reject_{correction_id}"):
-                    if update_correction_status(correction_id, "rejected", current_user):
+                    if update_correction_status(supabase, correction_id, "rejected", current_user):
                         st.warning("Correction rejetée.")
-                        st.cache_data.clear()
+                        invalidate_table_caches()
                         st.rerun()
             with col_btn3:
                 st.button("⏭️ Ignorer", key=f"skip_{correction_id}")
@@ -515,7 +906,7 @@ def render_corrections_tab():
 # TAB 3: ISSUES
 # =============================================================================
 
-def render_issues_tab():
+def render_issues_tab(supabase: Client):
     st.markdown("""
     <div class="main-header">
         <h1>📋 Exploration des Issues</h1>
@@ -523,7 +914,7 @@ def render_issues_tab():
     </div>
     """, unsafe_allow_html=True)
     
-    df_issues = load_issues()
+    df_issues = load_issues(supabase)
     if df_issues.empty:
         st.info("Aucune issue trouvée.")
         return
@@ -557,13 +948,18 @@ def render_issues_tab():
     
     st.divider()
     st.dataframe(filtered.head(100), use_container_width=True, hide_index=True)
-    st.download_button("📥 Exporter CSV", filtered.to_csv(index=False), "issues.csv", "text/csv")
+    # Callable : le CSV n'est sérialisé qu'au clic
+    st.download_button("📥 Exporter CSV", functools.partial(csv_bytes, filtered), "issues.csv", "text/csv")
 
 # =============================================================================
 # TAB 4: TABLES
 # =============================================================================
 
-def render_tables_tab():
+MAX_DISPLAY_COLUMNS = 20
+
+# Fragment : les widgets de l'onglet ne relancent que cette fonction, pas tout le script
+@st.fragment
+def render_tables_tab(supabase: Client):
     st.markdown("""
     <div class="main-header">
         <h1>📊 Visualisation des Tables</h1>
@@ -571,30 +967,63 @@ def render_tables_tab():
     </div>
     """, unsafe_allow_html=True)
     
-    col1, col2, col3 = st.columns([2, 1, 1])
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
     with col1:
-        selected_table = st.selectbox("Nom de la table", get_table_list(), key="table_select")
+        tables_meta = get_tables_meta(supabase)
+        selected_table = st.selectbox(
+            "Nom de la table", list(tables_meta), key="table_select",
+            format_func=lambda name: name if tables_meta[name] is None else f"{name} (~{tables_meta[name]:,} lignes)",
+        )
     with col2:
         columns = st.text_input("Colonnes", value="*", help="* pour toutes")
     with col3:
-        limit = st.slider("Limite", 10, 500, 100)
+        page_size = st.selectbox("Lignes par page", [50, 100, 250, 500], index=0)
+    with col4:
+        # Une position de page par table : changer de table repart de la page 1
+        page = st.number_input("Page", min_value=1, value=1, step=1, key=f"table_page_{selected_table}")
     
     if st.button("🔄 Rafraîchir"):
-        st.cache_data.clear()
-        st.rerun()
+        # N'invalide que les requêtes de tables, pas les autres caches
+        # Vidé avant la lecture ci-dessous, dans le même run du fragment : pas de st.rerun()
+        query_table.clear()
+        export_table_csv.clear()
+        get_tables_meta.clear()
     
     st.divider()
     
     if selected_table:
-        df = load_table_safe(selected_table, limit)
-        if not df.empty:
+        # Une seule page est récupérée (range PostgREST), le total vient de l'en-tête Content-Range.
+        # Total estimé par le planificateur Postgres : pas de COUNT(*) complet sur les grosses tables
+        select = ",".join(c.strip() for c in columns.split(",") if c.strip()) or "*"
+        try:
+            rows, total = query_table(supabase, selected_table, select, page_size, int(page), count="planned")
+        except httpx.HTTPError as e:
+            st.error(f"Erreur de lecture de `{selected_table}`: {e}")
+            return
+        n_pages = max(1, -(-(total or 0) // page_size))
+        if rows:
             col1, col2, col3 = st.columns(3)
-            col1.metric("Lignes", len(df))
-            col2.metric("Colonnes", len(df.columns))
+            col1.metric("Lignes (page/total)", f"{len(rows)}/{total if total is not None else '?'}")
+            col2.metric("Colonnes", len(rows[0]))
             col3.metric("Table", selected_table)
+            st.caption(f"Page {page} / {n_pages}")
             st.divider()
-            st.dataframe(df, use_container_width=True, hide_index=True)
-            st.download_button("📥 Télécharger CSV", df.to_csv(index=False), f"{selected_table}.csv", "text/csv")
+            # Lecture seule : la liste de dicts part directement dans st.dataframe, sans passer par pandas.
+            # Hauteur fixe (lignes virtualisées) et au plus MAX_DISPLAY_COLUMNS colonnes affichées avec "*"
+            all_columns = list(rows[0])
+            shown_columns = all_columns if select != "*" else all_columns[:MAX_DISPLAY_COLUMNS]
+            st.dataframe(rows, column_order=shown_columns, height=400, use_container_width=True, hide_index=True)
+            if len(shown_columns) < len(all_columns):
+                with st.expander(f"{len(all_columns) - len(shown_columns)} colonne(s) masquée(s)"):
+                    st.caption("Listez-les dans « Colonnes » pour les afficher : " + ", ".join(all_columns[len(shown_columns):]))
+            # Callables : l'export n'est construit qu'au clic, puis servi depuis le cache
+            export_args = (supabase, selected_table, select, page_size, int(page))
+            st.download_button("📥 Télécharger CSV", functools.partial(export_table_csv, *export_args),
+                               f"{selected_table}.csv", "text/csv")
+            st.download_button("📥 CSV (gzip)", functools.partial(export_table_csv, *export_args, compress=True),
+                               f"{selected_table}.csv.gz", "application/gzip")
+        elif total and page > n_pages:
+            st.warning(f"Page {page} hors limites ({n_pages} page(s) pour `{selected_table}`)")
         else:
             st.warning(f"Aucune donnée dans `{selected_table}`")
 
@@ -602,7 +1031,23 @@ def render_tables_tab():
 # TAB 5: STORAGE
 # =============================================================================
 
-def render_storage_tab():
+# Clés des entrées renvoyées par get_bucket_files (id et size à None pour les dossiers)
+STORAGE_FIELDS = itemgetter("name", "id", "created_at", "size")
+
+def open_storage_folder(path: str):
+    st.session_state.storage_folder = path
+
+def change_storage_bucket():
+    # Nouveau bucket : chemin et historique de préchargement de l'ancien bucket sont abandonnés
+    st.session_state.storage_folder = ""
+    st.session_state.pop("storage_prefetched", None)
+
+def storage_widget_key(prefix: str, path: str):
+    # Clé courte et stable quelle que soit la longueur / l'encodage du chemin
+    return f"{prefix}_{hashlib.blake2b(path.encode(), digest_size=6).hexdigest()}"
+
+@st.fragment
+def render_storage_tab(supabase: Client):
     st.markdown("""
     <div class="main-header">
         <h1>📁 Gestion du Storage</h1>
@@ -610,25 +1055,84 @@ def render_storage_tab():
     </div>
     """, unsafe_allow_html=True)
     
-    supabase = get_supabase()
     if not supabase:
         st.warning("Connexion Supabase requise.")
         return
     
     col1, col2 = st.columns(2)
     with col1:
-        bucket_name = st.text_input("Bucket", value="bucketprimelab", key="storage_bucket")
+        bucket_name = st.text_input("Bucket", value=DEFAULT_BUCKET, key="storage_bucket", on_change=change_storage_bucket)
     with col2:
-        folder_path = st.text_input("Dossier (optionnel)", value="", key="storage_folder")
+        # Pas de `value=` : la valeur est pilotée par les boutons de navigation via st.session_state
+        folder_path = st.text_input("Dossier (optionnel)", key="storage_folder")
+    
+    col_refresh, col_parent = st.columns([1, 5])
+    with col_refresh:
+        if st.button("🔄 Rafraîchir", key="storage_refresh"):
+            get_bucket_files.clear()
+            st.session_state.pop("storage_prefetched", None)
+    with col_parent:
+        if folder_path.strip("/"):
+            st.button("⬆️ Dossier parent", key="storage_parent", on_click=open_storage_folder,
+                      args=(folder_path.strip("/").rpartition("/")[0],))
     
     st.divider()
     
     try:
-        files = supabase.storage.from_(bucket_name).list(folder_path)
+        files = get_bucket_files(supabase, bucket_name, folder_path)
         if files:
             st.subheader(f"📂 Contenu de `{bucket_name}/{folder_path}`")
-            file_data = [{"Nom": f.get("name", "N/A"), "Type": "📁 Dossier" if f.get("id") is None else "📄 Fichier", "Créé": f.get("created_at", "N/A")[:10] if f.get("created_at") else "N/A"} for f in files]
-            st.dataframe(pd.DataFrame(file_data), use_container_width=True, hide_index=True)
+            # Colonnes extraites en un seul passage (zip transpose les tuples), puis un seul DataFrame
+            names, file_ids, created, file_sizes = zip(*map(STORAGE_FIELDS, files))
+            # Un seul passage pour les métriques et le tableau
+            is_folder, file_size_list = [], []
+            for file_id, size in zip(file_ids, file_sizes):
+                folder = file_id is None
+                is_folder.append(folder)
+                file_size_list.append(0 if folder else size or 0)
+            sizes = np.array(file_size_list, dtype=np.int64)
+            n_folders = sum(is_folder)
+            
+            col_a, col_b, col_c = st.columns(3)
+            col_a.metric("Dossiers", n_folders)
+            col_b.metric("Fichiers", len(files) - n_folders)
+            col_c.metric("Taille totale", format_file_size(int(sizes.sum())))
+            
+            # Rendu paginé : au plus STORAGE_PAGE_SIZE boutons de dossiers et lignes de tableau par page
+            n_pages = -(-len(files) // STORAGE_PAGE_SIZE)
+            page = 1
+            if n_pages > 1:
+                page = st.number_input(f"Page (sur {n_pages})", min_value=1, max_value=n_pages, value=1, step=1,
+                                       key=storage_widget_key("page", f"{bucket_name}/{folder_path}"))
+            view = slice((page - 1) * STORAGE_PAGE_SIZE, page * STORAGE_PAGE_SIZE)
+            page_folders = is_folder[view]
+            
+            # Grille limitée aux dossiers de la page : mêmes entrées que les lignes du tableau
+            folder_names = [name for name, folder in zip(names[view], page_folders) if folder and name]
+            if folder_names:
+                targets = [f"{folder_path.strip('/')}/{folder_name}".lstrip("/") for folder_name in folder_names]
+                # Préchargement une seule fois par page visitée (pas à chaque rerun), dossiers visibles seulement
+                prefetched = st.session_state.setdefault("storage_prefetched", set())
+                if len(prefetched) >= STORAGE_PREFETCH_HISTORY:
+                    # Longue session de navigation : l'historique reste borné (au pire, un dossier est repréchargé)
+                    prefetched.clear()
+                if (bucket_name, folder_path, page) not in prefetched:
+                    prefetched.add((bucket_name, folder_path, page))
+                    prefetch_bucket_folders(supabase, bucket_name, targets)
+                st.markdown("**📁 Dossiers**")
+                grid = st.columns(4)
+                for i, (folder_name, target) in enumerate(zip(folder_names, targets)):
+                    grid[i % 4].button(f"📁 {folder_name}", key=storage_widget_key("folder", target),
+                                       on_click=open_storage_folder, args=(target,), use_container_width=True)
+            
+            df_files = pd.DataFrame({
+                "Nom": [name or "N/A" for name in names[view]],
+                "Type": ["📁 Dossier" if folder else "📄 Fichier" for folder in page_folders],
+                "Taille": ["-" if folder else size for folder, size in zip(page_folders, format_file_sizes(sizes[view]))],
+                "Créé": format_datetimes(created[view]).to_numpy(),
+            })
+            st.caption(f"{len(df_files)} entrée(s) affichée(s) sur {len(files)}")
+            st.dataframe(df_files, use_container_width=True, hide_index=True)
         else:
             st.info("Bucket vide ou non accessible.")
     except Exception as e:
@@ -638,7 +1142,7 @@ def render_storage_tab():
 # TAB 6: UPLOAD
 # =============================================================================
 
-def render_upload_tab():
+def render_upload_tab(supabase: Client):
     st.markdown("""
     <div class="main-header">
         <h1>📤 Upload de Fichiers</h1>
@@ -646,26 +1150,56 @@ def render_upload_tab():
     </div>
     """, unsafe_allow_html=True)
     
-    supabase = get_supabase()
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("📁 Upload vers Storage")
-        bucket = st.text_input("Bucket cible", value="bucketprimelab", key="up_bucket")
-        uploaded_file = st.file_uploader("Choisir un fichier", type=["csv", "xlsx", "json", "txt", "pdf"])
-        if uploaded_file:
-            st.success(f"Fichier: {uploaded_file.name}")
+        bucket = st.text_input("Bucket cible", value=DEFAULT_BUCKET, key="up_bucket")
+        target_folder = st.text_input("Dossier cible (optionnel)", value="", key="up_folder")
+        uploaded_files = st.file_uploader("Choisir des fichiers", type=["csv", "xlsx", "json", "txt", "pdf"], accept_multiple_files=True)
+        if uploaded_files:
+            # Plan calculé en un seul passage, partagé par l'aperçu et la boucle d'upload
+            plan = build_upload_plan(uploaded_files, target_folder)
+            preview_data = pd.DataFrame({
+                "Chemin": [path for _, path, _ in plan],
+                "Taille (Ko)": [round(f.size / 1024, 1) for f, _, _ in plan],
+                "Type": [mime_type for _, _, mime_type in plan],
+            })
+            st.dataframe(preview_data, use_container_width=True, hide_index=True)
             if supabase and st.button("⬆️ Uploader", type="primary"):
-                try:
-                    supabase.storage.from_(bucket).upload(uploaded_file.name, uploaded_file.getvalue(), {"content-type": uploaded_file.type})
-                    st.success("✅ Uploadé!")
-                except Exception as e:
-                    st.error(f"Erreur: {e}")
+                # (chemin, erreur ou None) rangés à l'indice du fichier dans le plan
+                results = [None] * len(plan)
+                with st.status("Upload en cours…", expanded=True) as status:
+                    progress_bar = st.progress(0.0)
+                    last_refresh = time.monotonic()
+                    # Uploads indépendants et limités par le réseau : envoyés en parallèle.
+                    # Chaque worker lit son propre flux, sans getvalue() qui dupliquerait le fichier en mémoire.
+                    with ThreadPoolExecutor(max_workers=min(8, len(plan))) as executor:
+                        futures = {}
+                        for index, (f, path, mime_type) in enumerate(plan):
+                            f.seek(0)
+                            futures[executor.submit(upload_file_to_supabase, supabase, bucket, path, io.BufferedReader(f), mime_type)] = index
+                        for done, future in enumerate(as_completed(futures), 1):
+                            results[futures[future]] = future.result()
+                            # Une mise à jour de la barre au plus toutes les 100 ms (chaque appel part sur le WebSocket)
+                            now = time.monotonic()
+                            if now - last_refresh > 0.1 or done == len(futures):
+                                progress_bar.progress(done / len(futures))
+                                last_refresh = now
+                    error_count = sum(1 for _, error in results if error is not None)
+                    st.dataframe(pd.DataFrame({
+                        "Fichier": [path for path, _ in results],
+                        "Statut": [f"❌ {error}" if error is not None else "✅ Uploadé" for _, error in results],
+                    }), use_container_width=True, hide_index=True)
+                    status.update(
+                        label=f"{len(results) - error_count} OK / {error_count} KO",
+                        state="error" if error_count else "complete",
+                    )
     
     with col2:
         st.subheader("📊 Import CSV → Table")
         csv_file = st.file_uploader("Fichier CSV", type=["csv"], key="csv_up")
-        target_table = st.selectbox("Table cible", get_table_list(), key="import_tbl")
+        target_table = st.selectbox("Table cible", get_table_list(supabase), key="import_tbl")
         if csv_file:
             st.dataframe(pd.read_csv(csv_file, nrows=5), use_container_width=True, hide_index=True)
             if supabase and st.button("📥 Importer"):
@@ -697,17 +1231,28 @@ def main():
         </div>
         """, unsafe_allow_html=True)
     
-    # Tabs
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-        "🏠 Dashboard", "🤖 AI Corrections", "📋 Issues", "📊 Tables", "📁 Storage", "📤 Upload"
-    ])
-    
-    with tab1: render_dashboard_tab()
-    with tab2: render_corrections_tab()
-    with tab3: render_issues_tab()
-    with tab4: render_tables_tab()
-    with tab5: render_storage_tab()
-    with tab6: render_upload_tab()
+    if st.secrets.get("DEBUG"):
+        render_cache_stats()
+    
+    # Navigation : st.tabs exécuterait les six onglets (et leurs requêtes) à chaque rerun,
+    # seul l'onglet sélectionné est rendu ici.
+    tabs = {
+        "🏠 Dashboard": render_dashboard_tab,
+        "🤖 AI Corrections": render_corrections_tab,
+        "📋 Issues": render_issues_tab,
+        "📊 Tables": render_tables_tab,
+        "📁 Storage": render_storage_tab,
+        "📤 Upload": render_upload_tab,
+    }
+    active_tab = st.radio("Vue", list(tabs), horizontal=True, key="active_tab", label_visibility="collapsed")
+    # Client résolu une fois par rerun puis transmis aux helpers
+    supabase = get_supabase()
+    if supabase and "prewarmed" not in st.session_state:
+        # Une fois par session : la racine du bucket par défaut est listée en arrière-plan
+        # pendant le rendu de l'onglet actif, l'ouverture de Storage tombe dans le cache
+        st.session_state.prewarmed = True
+        submit_background(get_bucket_files, supabase, DEFAULT_BUCKET, "")
+    tabs[active_tab](supabase)
 
 if __name__ == "__main__":
     main()
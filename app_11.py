@@ -1,8 +1,16 @@
 import streamlit as st
 import fitz  # PyMuPDF
 import pandas as pd
+import pyarrow.parquet as pq
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from PIL import Image
+
+from pdf_render import RENDER_WIDTH_PX, render_doc_page, render_page
 
 # Configuration de la page
 st.set_page_config(
@@ -58,6 +66,8 @@ CV_FILES_MAPPING = {
     ("Emma", "GARCIA"): "CV 06 Emma Garcia.pdf",
     ("Jean-Pierre", "MULLER"): "CV 07 Jean Pierre Muller.pdf",
 }
+# Même mapping, clés normalisées (casefold) : la casse du prénom et du nom n'empêche plus la correspondance
+CV_FILES_MAPPING_NORM = {(prenom.casefold(), nom.casefold()): fichier for (prenom, nom), fichier in CV_FILES_MAPPING.items()}
 
 # Chemin des fichiers (adaptés à la structure GitHub)
 DATA_PATH = Path("data")
@@ -67,54 +77,159 @@ CV_PARSED_FILE = DATA_PATH / "cv" / "CV Parsed.xlsx"
 MATCHING_FILE = DATA_PATH / "Compatibilité_CV_et_Fiche_de_poste.xlsx"
 LOGO_FILE = Path("Logo CHRU Nancy.png")
 
+# Colonnes du fichier de matching réellement affichées
+MATCHING_COLUMNS = ['Model', 'Prénom', 'Nom', 'Score global']
+# Colonnes techniques du fichier de CVs parsés, jamais affichées
+PARSED_CV_EXCLUDED_COLUMNS = ('PromptID', 'Model', 'id_candidat')
+# Libellés des colonnes des CVs parsés : seules ces colonnes sont chargées d'office,
+# les autres sont lues à la demande si l'utilisateur les affiche
+PARSED_CV_COLUMN_LABELS = {
+    'prenom': 'Prénom',
+    'nom': 'Nom',
+    'ville': 'Ville',
+    'annees_experience': 'Années Exp.',
+    'diplome_ide_annee': 'Diplôme IDE',
+    'experience_oncologie_annees': 'Exp. Onco (ans)',
+    'experience_urologie_annees': 'Exp. Uro (ans)',
+    'experience_dispositif_annonce': 'Disp. Annonce',
+    'disponibilite': 'Disponibilité',
+    'email': 'Email',
+    'telephone': 'Téléphone',
+    'experience_oncologie_details': 'Détails Onco',
+    'experience_urologie_details': 'Détails Uro',
+    'formations_complementaires': 'Formations',
+    'principales_competences_techniques': 'Compétences Tech.',
+    'competences_relationnelles': 'Comp. Relationnelles',
+    'competences_coordination': 'Comp. Coordination',
+    'points_forts_pour_poste_annonce': 'Points Forts',
+    'points_vigilance': 'Points Vigilance',
+    'experience_dispositif_annonce_details': 'Détails Disp. Annonce',
+    'date_naissance': 'Date Naissance',
+    'adresse': 'Adresse',
+    'code_postal': 'Code Postal',
+    'langues': 'Langues',
+    'lettre_motivation_presente': 'Lettre Motiv.',
+    'experience_etp_booleen': 'Exp. ETP',
+    'experience_etp_formation_40h': 'Formation ETP 40h',
+    'experience_soins_palliatifs_annees': 'Exp. Soins Palliatifs',
+    'experience_soins_palliatifs_details': 'Détails Soins Palliatifs'
+}
+
+
+@st.cache_resource
+def get_render_pool():
+    """Pool de processus partagé pour la rastérisation (contexte spawn : pas de fork du serveur Streamlit)"""
+    return ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn"))
+
+
+# PyMuPDF n'est pas thread-safe : les sessions Streamlit (threads) y accèdent une à une.
+# Verrou partagé via cache_resource : le script est réexécuté à chaque rerun, un verrou
+# de module serait recréé à chaque fois et n'exclurait rien entre sessions
+@st.cache_resource
+def get_fitz_lock():
+    return threading.Lock()
+
+
+# Cache borné : au plus PDF_CACHE_ENTRIES versions de PDF rendues gardées en mémoire
+PDF_CACHE_ENTRIES = 32
+# Documents PyMuPDF gardés ouverts entre deux reruns (fermés dès qu'ils sortent du cache)
+PDF_DOC_CACHE_ENTRIES = 4
+
+
+@st.cache_resource
+def get_open_pdf_docs():
+    """Documents ouverts, du moins au plus récemment utilisé, partagés entre les sessions"""
+    return OrderedDict()
+
+
+def get_pdf_doc(path_str, mtime):
+    """Document PyMuPDF ouvert une fois par version du fichier (xref parsée une seule fois).
+
+    LRU de PDF_DOC_CACHE_ENTRIES documents : le plus ancien est fermé explicitement à l'éviction.
+    À n'appeler que sous get_fitz_lock().
+    """
+    docs = get_open_pdf_docs()
+    key = (path_str, mtime)
+    doc = docs.pop(key, None)
+    if doc is None:
+        doc = fitz.open(path_str)
+    docs[key] = doc
+    while len(docs) > PDF_DOC_CACHE_ENTRIES:
+        docs.popitem(last=False)[1].close()
+    return doc
+
+
+# Largeur utile approximative de la page en layout "wide", pour dimensionner les rendus
+LAYOUT_WIDTH_PX = 1400
+# Rendu à 2x la largeur affichée (écrans haute densité), borné : au moins RENDER_WIDTH_PX
+# (au-dessus de la largeur native A4 / Letter, 595-612 pt : zoom >= 1.0), au plus MAX_RENDER_WIDTH_PX
+RENDER_DPI_SCALE = 2
+MAX_RENDER_WIDTH_PX = 1600
+# En dessous de ce nombre de pages, le rendu reste séquentiel dans le process Streamlit
+PARALLEL_MIN_PAGES = 4
+
+
+@st.cache_data(show_spinner=False, max_entries=PDF_CACHE_ENTRIES)
+def render_pdf_pages(path_str, mtime, width):
+    """Rastérise les pages d'un PDF en images encodées, en parallèle (une page par worker).
+
+    Les PDF courts (CV d'une à trois pages) sont rendus sur place : lancer les workers
+    coûterait plus que le rendu lui-même.
+    Mis en cache par (chemin, date de modification, largeur) : un fichier modifié est re-rendu.
+    """
+    with get_fitz_lock():
+        doc = get_pdf_doc(path_str, mtime)
+        page_count = len(doc)
+        if page_count < PARALLEL_MIN_PAGES:
+            try:
+                return [render_doc_page(doc, page_num, width) for page_num in range(page_count)]
+            finally:
+                # Comme dans les workers : le store MuPDF du process Streamlit ne grossit pas à chaque CV
+                fitz.TOOLS.store_shrink(100)
+    return list(get_render_pool().map(render_page, repeat(path_str), range(page_count), repeat(width)))
 
-def get_score_color(score):
-    """Retourne la couleur selon le score"""
-    if score >= 85:
-        return "#27ae60"  # Vert
-    elif score >= 75:
-        return "#f1c40f"  # Jaune
-    elif score >= 60:
-        return "#e67e22"  # Orange
-    elif score >= 40:
-        return "#e74c3c"  # Rouge
-    else:
-        return "#c0392b"  # Rouge foncé
-
-
-def get_score_bg_color(score):
-    """Retourne la couleur de fond selon le score (version claire)"""
-    if score >= 85:
-        return "#d4edda"  # Vert clair
-    elif score >= 75:
-        return "#fff3cd"  # Jaune clair
-    elif score >= 60:
-        return "#ffeaa7"  # Orange clair
-    elif score >= 40:
-        return "#f8d7da"  # Rouge clair
-    else:
-        return "#f5c6cb"  # Rouge foncé clair
 
+@st.cache_resource(max_entries=PDF_CACHE_ENTRIES)
+def fiche_poste_images(mtime, width):
+    """Pages de la fiche de poste, identiques pour tous les utilisateurs : partagées telles quelles
+    entre les sessions (cache_resource), sans la copie que cache_data fait à chaque lecture"""
+    return render_pdf_pages(str(FICHE_POSTE), mtime, width)
 
-def pdf_to_images(pdf_path):
-    """Convertit un PDF en liste d'images"""
+
+def pdf_to_images(pdf_path, width=RENDER_WIDTH_PX):
+    """Convertit un PDF en liste d'images encodées (bytes), directement affichables par st.image"""
     images = []
     try:
-        doc = fitz.open(pdf_path)
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            mat = fitz.Matrix(1.5, 1.5)
-            pix = page.get_pixmap(matrix=mat)
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            images.append(img)
-        doc.close()
+        pdf_path = Path(pdf_path)
+        if pdf_path == FICHE_POSTE:
+            images = fiche_poste_images(pdf_path.stat().st_mtime, width)
+        else:
+            images = render_pdf_pages(str(pdf_path), pdf_path.stat().st_mtime, width)
     except Exception as e:
         st.error(f"Erreur lors de la lecture du PDF: {e}")
     return images
 
 
-def display_pdf(pdf_path, container_key="pdf"):
-    """Affiche un PDF dans Streamlit"""
+@st.cache_data(show_spinner=False, max_entries=PDF_CACHE_ENTRIES)
+def read_pdf_bytes(path_str, mtime):
+    """Contenu brut d'un PDF, mis en cache par (chemin, date de modification)"""
+    return Path(path_str).read_bytes()
+
+
+def panel_width_px(ratio_pct):
+    """Largeur de rendu d'un panneau occupant `ratio_pct` % de la page.
+
+    Rendu à RENDER_DPI_SCALE fois la largeur du panneau (écrans haute densité), jamais sous
+    RENDER_WIDTH_PX (zoom >= 1.0 pour une page A4 ou Letter) ni au-delà de MAX_RENDER_WIDTH_PX.
+    Arrondie par paliers de 200 px pour limiter le nombre de variantes gardées en cache
+    quand le slider bouge.
+    """
+    width = round(LAYOUT_WIDTH_PX * ratio_pct / 100 * RENDER_DPI_SCALE / 200) * 200
+    return min(max(width, RENDER_WIDTH_PX), MAX_RENDER_WIDTH_PX)
+
+
+def display_pdf(pdf_path, container_key="pdf", native=False, width=RENDER_WIDTH_PX):
+    """Affiche un PDF dans Streamlit (rendu natif du navigateur, ou pages rastérisées)"""
     pdf_path = Path(pdf_path)
     
     if not pdf_path.exists():
@@ -122,17 +237,70 @@ def display_pdf(pdf_path, container_key="pdf"):
         st.info(f"Vérifiez que le fichier existe dans: {DATA_PATH}")
         return
     
-    images = pdf_to_images(pdf_path)
+    if native:
+        # Le navigateur affiche le PDF lui-même : aucune rastérisation côté serveur
+        try:
+            st.pdf(read_pdf_bytes(str(pdf_path), pdf_path.stat().st_mtime), height=700, key=container_key)
+            return
+        except Exception as e:
+            st.warning(f"Affichage PDF natif indisponible ({e}) : affichage en images")
+    
+    images = pdf_to_images(pdf_path, width)
     if images:
         for i, img in enumerate(images):
             st.image(img, use_container_width=True, caption=f"Page {i+1}/{len(images)}")
 
 
+# Lecteur xlsx en Rust (python-calamine), nettement plus rapide qu'openpyxl
+EXCEL_ENGINE = "calamine"
+
+
+def read_excel_cached(xlsx_path, columns=None, exclude=()):
+    """Lit un fichier Excel via une copie Parquet voisine, régénérée si l'Excel est plus récent.
+
+    Seules les colonnes `columns` présentes dans le fichier (ou toutes sauf `exclude`) sont lues.
+    """
+    def wanted(column):
+        return (columns is None or column in columns) and column not in exclude
+
+    parquet_path = xlsx_path.with_suffix('.parquet')
+    try:
+        if not parquet_path.exists() or parquet_path.stat().st_mtime < xlsx_path.stat().st_mtime:
+            # Écrit à côté puis renommé (atomique) : jamais de Parquet tronqué lu au démarrage suivant,
+            # même si l'écriture est interrompue ou que deux sessions régénèrent le fichier en même temps
+            tmp_path = parquet_path.with_name(f"{parquet_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                pd.read_excel(xlsx_path, engine=EXCEL_ENGINE).to_parquet(tmp_path, index=False, compression="zstd")
+                os.replace(tmp_path, parquet_path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+        return pd.read_parquet(parquet_path, columns=[c for c in pq.read_schema(parquet_path).names if wanted(c)])
+    except Exception:
+        # Dossier en lecture seule ou colonne non convertible : lecture Excel directe
+        return pd.read_excel(xlsx_path, engine=EXCEL_ENGINE, usecols=wanted)
+
+
+def excel_columns(xlsx_path):
+    """Noms des colonnes d'un fichier Excel (schéma de sa copie Parquet, sinon ligne d'en-tête seule)"""
+    try:
+        return pq.read_schema(xlsx_path.with_suffix('.parquet')).names
+    except Exception:
+        return pd.read_excel(xlsx_path, engine=EXCEL_ENGINE, nrows=0).columns.tolist()
+
+
 @st.cache_data
 def load_matching_results():
     """Charge les résultats de matching depuis le fichier Excel"""
     if MATCHING_FILE.exists():
-        df = pd.read_excel(MATCHING_FILE)
+        df = read_excel_cached(MATCHING_FILE, columns=MATCHING_COLUMNS)
+        # Fichier CV de chaque ligne, résolu une fois au chargement (NaN si absent du mapping)
+        df['cv_file'] = pd.MultiIndex.from_arrays(
+            [df['Prénom'].str.casefold(), df['Nom'].str.casefold()]
+        ).map(CV_FILES_MAPPING_NORM)
+        # Peu de modèles distincts, filtrés à chaque rerun : comparaison sur les codes de catégorie
+        df['Model'] = df['Model'].astype('category')
+        # Scores entre 0 et 100 : float32 suffit (moitié moins de mémoire à filtrer et trier)
+        df['Score global'] = pd.to_numeric(df['Score global'], errors='coerce', downcast='float')
         return df
     return None
 
@@ -141,30 +309,86 @@ def load_matching_results():
 def load_parsed_cvs():
     """Charge les CVs parsés depuis le fichier Excel"""
     if CV_PARSED_FILE.exists():
-        df = pd.read_excel(CV_PARSED_FILE)
+        df = read_excel_cached(CV_PARSED_FILE, columns=list(PARSED_CV_COLUMN_LABELS))
         # Ajouter le 0 devant les numéros de téléphone
         if 'telephone' in df.columns:
-            df['telephone'] = df['telephone'].apply(lambda x: f"0{int(x)}" if pd.notna(x) else x)
+            telephone = pd.to_numeric(df['telephone'], errors='coerce').astype('Int64')
+            df['telephone'] = ("0" + telephone.astype('string')).where(telephone.notna(), df['telephone'])
+        # Peu de villes distinctes, filtrées à chaque rerun : comparaison sur les codes de catégorie
+        if 'ville' in df.columns:
+            df['ville'] = df['ville'].astype('category')
         return df
     return None
 
 
-def get_cv_file(prenom, nom):
-    """Retourne le chemin complet du fichier CV pour un candidat"""
-    filename = CV_FILES_MAPPING.get((prenom, nom), None)
-    if filename:
-        return CV_PATH / filename
-    return None
+@st.cache_data
+def parsed_cv_columns():
+    """Toutes les colonnes affichables des CVs parsés (colonnes techniques écartées)"""
+    return [c for c in excel_columns(CV_PARSED_FILE) if c not in PARSED_CV_EXCLUDED_COLUMNS]
 
 
-def style_score(val):
-    """Style pour les colonnes de score"""
-    try:
-        score = float(val)
-        color = get_score_color(score)
-        return f'background-color: {color}; color: white; font-weight: bold; text-align: center;'
-    except:
-        return ''
+@st.cache_data
+def parsed_cv_rows():
+    """Libellés des lignes de chaque candidat (prénom, nom), dans l'ordre du fichier.
+
+    Un candidat peut avoir plusieurs lignes (un parsing par modèle / prompt).
+    """
+    df = load_parsed_cvs()
+    return {key: df.index[positions] for key, positions in df.groupby(['prenom', 'nom'], sort=False).indices.items()}
+
+
+@st.cache_data
+def load_parsed_cv_columns(columns):
+    """Colonnes des CVs parsés hors PARSED_CV_COLUMN_LABELS, lues à la demande"""
+    return read_excel_cached(CV_PARSED_FILE, columns=list(columns))
+
+
+def matching_models():
+    """Modèles présents dans les résultats (catégories de la colonne, déjà triées au chargement)"""
+    return load_matching_results()['Model'].cat.categories.tolist()
+
+
+@st.cache_data
+def matching_model_means():
+    """Score global moyen par modèle, en un seul groupby"""
+    return load_matching_results().groupby('Model', sort=False, observed=True)['Score global'].mean()
+
+
+def parsed_cv_cities():
+    """Villes des CVs parsés (catégories de la colonne, déjà triées et sans valeur manquante)"""
+    df = load_parsed_cvs()
+    if 'ville' not in df.columns:
+        return []
+    # Déjà catégorielle depuis le chargement : astype est alors sans copie ni tri
+    return df['ville'].astype('category').cat.categories.tolist()
+
+
+@st.cache_data
+def filter_matching(model_filter, score_min, sort_col, sort_asc):
+    """Filtre et trie les résultats de matching.
+
+    Le DataFrame est relu depuis load_matching_results (déjà en cache) plutôt que passé
+    en argument : seuls les filtres scalaires sont hachés pour la clé de cache.
+    """
+    df = load_matching_results()
+    if model_filter != 'Tous':
+        df = df[df['Model'] == model_filter]
+    if score_min > 0:
+        df = df[df['Score global'] >= score_min]
+    # Filtres et tri renvoient déjà de nouveaux DataFrames : pas de copie préalable
+    return df.sort_values(by=sort_col, ascending=sort_asc)
+
+
+# Seuils de couleur des scores : <40, 40-60, 60-75, 75-85, ≥85 (bornes basses incluses)
+SCORE_BINS = [float('-inf'), 40, 60, 75, 85, float('inf')]
+SCORE_COLORS = ["#c0392b", "#e74c3c", "#e67e22", "#f1c40f", "#27ae60"]
+
+
+def style_scores(scores):
+    """Style d'une colonne de scores en une passe (pd.cut), pour Styler.apply"""
+    colors = pd.cut(pd.to_numeric(scores, errors='coerce'), bins=SCORE_BINS, labels=SCORE_COLORS, right=False)
+    css = 'background-color: ' + colors.astype(object) + '; color: white; font-weight: bold; text-align: center;'
+    return css.where(colors.notna(), '')
 
 
 def view_matching():
@@ -186,24 +410,35 @@ def view_matching():
     # Initialisation du state
     if 'selected_candidate' not in st.session_state:
         st.session_state.selected_candidate = None
-    if 'col_ratio' not in st.session_state:
-        st.session_state.col_ratio = 65
     
     # Slider pour ajuster la largeur des colonnes
-    col_ratio = st.slider("📐 Ajuster la largeur (Résultats ↔ CV)", 30, 85, st.session_state.col_ratio, key="col_slider")
-    st.session_state.col_ratio = col_ratio
+    # Le slider n'envoie sa valeur qu'au relâchement ; la valeur persiste via sa clé, sans copie manuelle
+    col_ratio = st.slider("📐 Ajuster la largeur (Résultats ↔ CV)", 30, 85, 65, key="col_slider")
+    native_pdf = st.toggle("🖥️ Affichage PDF natif", value=False, help="PDF rendu par le navigateur plutôt qu'en images")
     
+    matching_panel(col_ratio, native_pdf)
+
+
+@st.fragment
+def matching_panel(col_ratio, native_pdf):
+    """Résultats et CV du candidat sélectionné.
+
+    Fragment : sélectionner une ligne ou changer un filtre ne réexécute que ce panneau,
+    pas l'en-tête ni l'onglet des CVs parsés.
+    """
     # Layout principal en 2 colonnes avec ratio ajustable
     col_left, col_cv = st.columns([col_ratio, 100 - col_ratio])
     
     with col_left:
-        # Section Fiche de poste (collapsible)
-        with st.expander("📄 Voir la Fiche de Poste", expanded=False):
-            if FICHE_POSTE.exists():
-                display_pdf(FICHE_POSTE, "fiche_poste")
-            else:
-                st.info("📄 **Poste:** Infirmier(e) d'Annonce en Urologie")
-                st.info("🏥 **Structure:** CHRU Nancy - Pôle Digestif")
+        # Section Fiche de poste : un expander fermé exécute quand même son contenu,
+        # le toggle ne rend le PDF que lorsqu'il est affiché
+        if st.toggle("📄 Voir la Fiche de Poste", value=False, key="show_fiche"):
+            with st.container(border=True):
+                if FICHE_POSTE.exists():
+                    display_pdf(FICHE_POSTE, "fiche_poste", native=native_pdf, width=panel_width_px(col_ratio))
+                else:
+                    st.info("📄 **Poste:** Infirmier(e) d'Annonce en Urologie")
+                    st.info("🏥 **Structure:** CHRU Nancy - Pôle Digestif")
         
         st.markdown('<div class="section-header">📊 Résultats du Matching</div>', unsafe_allow_html=True)
         
@@ -211,7 +446,7 @@ def view_matching():
         col_f1, col_f2, col_f3 = st.columns([1, 1, 2])
         
         with col_f1:
-            models = ['Tous'] + sorted(df_matching['Model'].unique().tolist())
+            models = ['Tous'] + matching_models()
             model_filter = st.selectbox("🤖 Modèle", models)
         
         with col_f2:
@@ -230,52 +465,35 @@ def view_matching():
         with col_f3:
             score_min = st.slider("Score minimum", 0, 100, 0)
         
-        # Appliquer les filtres
-        df_filtered = df_matching.copy()
-        
-        if model_filter != 'Tous':
-            df_filtered = df_filtered[df_filtered['Model'] == model_filter]
-        
-        if score_min > 0:
-            df_filtered = df_filtered[df_filtered['Score global'] >= score_min]
-        
-        # Trier
-        df_filtered = df_filtered.sort_values(by=sort_col, ascending=sort_asc)
+        # Appliquer les filtres (résultat mis en cache : le slider de largeur ne refiltre rien)
+        df_filtered = filter_matching(model_filter, score_min, sort_col, sort_asc)
         
         st.markdown(f"**{len(df_filtered)} résultat(s)**")
         
-        # Affichage des résultats sous forme de cartes
-        for idx, row in df_filtered.iterrows():
-            score = row['Score global']
-            color = get_score_color(score)
-            bg_color = get_score_bg_color(score)
-            
-            with st.container():
-                col1, col2, col3 = st.columns([3, 1, 1])
-                
-                with col1:
-                    st.markdown(f"""
-                    <div style="background-color: {bg_color}; padding: 10px; border-radius: 8px; margin: 5px 0;">
-                        <strong>{row['Prénom']} {row['Nom']}</strong><br>
-                        <small>Modèle: {row['Model']}</small>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with col2:
-                    st.markdown(f"""
-                    <div style="background-color: {color}; color: white; padding: 10px; border-radius: 8px; text-align: center; margin: 5px 0;">
-                        <strong>{score:.0f}</strong>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with col3:
-                    if st.button("👁️", key=f"view_{idx}"):
-                        st.session_state.selected_candidate = {
-                            'prenom': row['Prénom'],
-                            'nom': row['Nom'],
-                            'score': score,
-                            'model': row['Model']
-                        }
+        # Un seul tableau plutôt qu'une rangée de widgets par candidat : la ligne sélectionnée ouvre le CV
+        df_view = df_filtered[['Prénom', 'Nom', 'Model', 'Score global']].reset_index(drop=True)
+        event = st.dataframe(
+            df_view.style.apply(style_scores, subset=['Score global']).format({'Score global': '{:.0f}'}),
+            column_config={'Model': 'Modèle'},
+            use_container_width=True,
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="single-row",
+            key="matches",
+        )
+        # Une sélection faite avant de resserrer les filtres peut pointer au-delà du tableau filtré
+        selected_rows = [i for i in event.selection.rows if i < len(df_filtered)]
+        if selected_rows:
+            row = df_filtered.iloc[selected_rows[0]]
+            st.session_state.selected_candidate = {
+                'prenom': row['Prénom'],
+                'nom': row['Nom'],
+                'score': row['Score global'],
+                'model': row['Model'],
+                'cv_file': row['cv_file'] if pd.notna(row['cv_file']) else None
+            }
+        else:
+            st.session_state.selected_candidate = None
     
     with col_cv:
         st.markdown('<div class="section-header">📄 CV du Candidat</div>', unsafe_allow_html=True)
@@ -284,26 +502,24 @@ def view_matching():
             candidate = st.session_state.selected_candidate
             st.markdown(f"**{candidate['prenom']} {candidate['nom']}** - Score: {candidate['score']:.0f}")
             
-            # Trouver le fichier CV
-            cv_path = get_cv_file(candidate['prenom'], candidate['nom'].upper())
+            # Fichier CV déjà résolu au chargement (colonne cv_file)
+            cv_path = CV_PATH / candidate['cv_file'] if candidate['cv_file'] else None
             
             if cv_path and cv_path.exists():
-                display_pdf(cv_path, f"cv_{candidate['prenom']}_{candidate['nom']}")
+                display_pdf(cv_path, f"cv_{candidate['prenom']}_{candidate['nom']}", native=native_pdf,
+                            width=panel_width_px(100 - col_ratio))
             else:
                 st.warning(f"CV non trouvé pour {candidate['prenom']} {candidate['nom']}")
                 st.info(f"Chemin attendu: {cv_path}")
         else:
-            st.info("👈 Cliquez sur 👁️ pour afficher un CV")
+            st.info("👈 Sélectionnez une ligne pour afficher un CV")
             
             # Stats rapides
-            if df_matching is not None:
-                st.markdown("### 📈 Statistiques")
-                
-                # Par modèle
-                for model in df_matching['Model'].unique():
-                    df_model = df_matching[df_matching['Model'] == model]
-                    avg_score = df_model['Score global'].mean()
-                    st.metric(f"Score moyen ({model})", f"{avg_score:.1f}")
+            st.markdown("### 📈 Statistiques")
+            
+            # Par modèle
+            for model, avg_score in matching_model_means().items():
+                st.metric(f"Score moyen ({model})", f"{avg_score:.1f}")
 
 
 def view_parsed_cvs():
@@ -331,7 +547,7 @@ def view_parsed_cvs():
     col_f1, col_f2, col_f3, col_f4 = st.columns(4)
     
     with col_f1:
-        villes = ['Toutes'] + sorted(df['ville'].dropna().unique().tolist())
+        villes = ['Toutes'] + parsed_cv_cities()
         ville_filter = st.selectbox("Ville", villes)
     
     with col_f2:
@@ -365,9 +581,8 @@ def view_parsed_cvs():
     # Sélection des colonnes à afficher
     st.markdown("### 📋 Tableau des candidats")
     
-    all_cols = df.columns.tolist()
-    cols_to_remove = ['PromptID', 'Model', 'id_candidat']
-    available_cols = [c for c in all_cols if c not in cols_to_remove]
+    # Colonnes techniques (PromptID, Model, id_candidat) écartées ; seules les colonnes libellées sont chargées
+    available_cols = parsed_cv_columns()
     
     default_cols = [c for c in colonnes_principales if c in available_cols]
     selected_cols = st.multiselect(
@@ -377,40 +592,13 @@ def view_parsed_cvs():
     )
     
     if selected_cols:
-        column_labels = {
-            'prenom': 'Prénom',
-            'nom': 'Nom',
-            'ville': 'Ville',
-            'annees_experience': 'Années Exp.',
-            'diplome_ide_annee': 'Diplôme IDE',
-            'experience_oncologie_annees': 'Exp. Onco (ans)',
-            'experience_urologie_annees': 'Exp. Uro (ans)',
-            'experience_dispositif_annonce': 'Disp. Annonce',
-            'disponibilite': 'Disponibilité',
-            'email': 'Email',
-            'telephone': 'Téléphone',
-            'experience_oncologie_details': 'Détails Onco',
-            'experience_urologie_details': 'Détails Uro',
-            'formations_complementaires': 'Formations',
-            'principales_competences_techniques': 'Compétences Tech.',
-            'competences_relationnelles': 'Comp. Relationnelles',
-            'competences_coordination': 'Comp. Coordination',
-            'points_forts_pour_poste_annonce': 'Points Forts',
-            'points_vigilance': 'Points Vigilance',
-            'experience_dispositif_annonce_details': 'Détails Disp. Annonce',
-            'date_naissance': 'Date Naissance',
-            'adresse': 'Adresse',
-            'code_postal': 'Code Postal',
-            'langues': 'Langues',
-            'lettre_motivation_presente': 'Lettre Motiv.',
-            'experience_etp_booleen': 'Exp. ETP',
-            'experience_etp_formation_40h': 'Formation ETP 40h',
-            'experience_soins_palliatifs_annees': 'Exp. Soins Palliatifs',
-            'experience_soins_palliatifs_details': 'Détails Soins Palliatifs'
-        }
+        # Colonnes non chargées d'office : lues à la demande et alignées sur l'index des lignes filtrées
+        extra_cols = [c for c in selected_cols if c not in df.columns]
+        if extra_cols:
+            df_filtered = df_filtered.join(load_parsed_cv_columns(tuple(extra_cols)))
         
         df_display = df_filtered[selected_cols].copy()
-        df_display.columns = [column_labels.get(c, c) for c in selected_cols]
+        df_display.columns = [PARSED_CV_COLUMN_LABELS.get(c, c) for c in selected_cols]
         
         st.dataframe(
             df_display,
@@ -433,51 +621,54 @@ def view_parsed_cvs():
     st.markdown("---")
     st.markdown("### 🔎 Détails d'un candidat")
     
-    candidat_options = df_filtered.apply(lambda x: f"{x['prenom']} {x['nom']}", axis=1).tolist()
+    # Options (prénom, nom) construites colonne par colonne : pas d'apply ligne à ligne
+    # ni de découpage du libellé (un prénom composé avec espace casserait le split)
+    candidat_options = list(zip(df_filtered['prenom'], df_filtered['nom']))
     
     if candidat_options:
-        selected_candidat = st.selectbox("Sélectionner un candidat", candidat_options)
+        selected_candidat = st.selectbox("Sélectionner un candidat", candidat_options,
+                                         format_func=lambda option: f"{option[0]} {option[1]}")
         
         if selected_candidat:
-            parts = selected_candidat.split(' ', 1)
-            candidat_data = df_filtered[
-                (df_filtered['prenom'] == parts[0]) & 
-                (df_filtered['nom'] == parts[1])
-            ].iloc[0]
+            # Lignes du candidat trouvées par clé (index construit au chargement), puis la première
+            # qui passe les filtres actifs : jamais une ligne exclue par les filtres
+            label = next(l for l in parsed_cv_rows()[selected_candidat] if l in df_filtered.index)
+            candidat_data = df_filtered.loc[label]
             
             col1, col2 = st.columns(2)
             
+            # Chaque bloc est émis en un seul st.markdown (lignes séparées par un saut de ligne Markdown)
             with col1:
-                st.markdown("#### 👤 Informations générales")
-                st.write(f"**Nom:** {candidat_data['prenom']} {candidat_data['nom']}")
-                st.write(f"**Ville:** {candidat_data.get('ville', 'N/A')}")
-                st.write(f"**Email:** {candidat_data.get('email', 'N/A')}")
-                st.write(f"**Téléphone:** {candidat_data.get('telephone', 'N/A')}")
-                st.write(f"**Années d'expérience:** {candidat_data.get('annees_experience', 'N/A')}")
-                st.write(f"**Diplôme IDE:** {candidat_data.get('diplome_ide_annee', 'N/A')}")
-                st.write(f"**Disponibilité:** {candidat_data.get('disponibilite', 'N/A')}")
+                st.markdown("  \n".join([
+                    "#### 👤 Informations générales",
+                    f"**Nom:** {candidat_data['prenom']} {candidat_data['nom']}",
+                    f"**Ville:** {candidat_data.get('ville', 'N/A')}",
+                    f"**Email:** {candidat_data.get('email', 'N/A')}",
+                    f"**Téléphone:** {candidat_data.get('telephone', 'N/A')}",
+                    f"**Années d'expérience:** {candidat_data.get('annees_experience', 'N/A')}",
+                    f"**Diplôme IDE:** {candidat_data.get('diplome_ide_annee', 'N/A')}",
+                    f"**Disponibilité:** {candidat_data.get('disponibilite', 'N/A')}",
+                ]))
             
             with col2:
-                st.markdown("#### 🏥 Expériences spécifiques")
-                st.write(f"**Exp. Oncologie:** {candidat_data.get('experience_oncologie_annees', 'N/A')} ans")
+                lines = ["#### 🏥 Expériences spécifiques"]
+                lines.append(f"**Exp. Oncologie:** {candidat_data.get('experience_oncologie_annees', 'N/A')} ans")
                 if pd.notna(candidat_data.get('experience_oncologie_details')):
-                    st.write(f"↳ {candidat_data['experience_oncologie_details']}")
-                
-                st.write(f"**Exp. Urologie:** {candidat_data.get('experience_urologie_annees', 'N/A')} ans")
+                    lines.append(f"↳ {candidat_data['experience_oncologie_details']}")
+                lines.append(f"**Exp. Urologie:** {candidat_data.get('experience_urologie_annees', 'N/A')} ans")
                 if pd.notna(candidat_data.get('experience_urologie_details')):
-                    st.write(f"↳ {candidat_data['experience_urologie_details']}")
-                
-                st.write(f"**Dispositif d'annonce:** {'Oui' if candidat_data.get('experience_dispositif_annonce') else 'Non'}")
+                    lines.append(f"↳ {candidat_data['experience_urologie_details']}")
+                lines.append(f"**Dispositif d'annonce:** {'Oui' if candidat_data.get('experience_dispositif_annonce') else 'Non'}")
                 if pd.notna(candidat_data.get('experience_dispositif_annonce_details')):
-                    st.write(f"↳ {candidat_data['experience_dispositif_annonce_details']}")
-            
-            st.markdown("#### 💪 Compétences et Points Forts")
+                    lines.append(f"↳ {candidat_data['experience_dispositif_annonce_details']}")
+                st.markdown("  \n".join(lines))
             
+            lines = ["#### 💪 Compétences et Points Forts"]
             if pd.notna(candidat_data.get('principales_competences_techniques')):
-                st.write(f"**Compétences techniques:** {candidat_data['principales_competences_techniques']}")
-            
+                lines.append(f"**Compétences techniques:** {candidat_data['principales_competences_techniques']}")
             if pd.notna(candidat_data.get('competences_relationnelles')):
-                st.write(f"**Compétences relationnelles:** {candidat_data['competences_relationnelles']}")
+                lines.append(f"**Compétences relationnelles:** {candidat_data['competences_relationnelles']}")
+            st.markdown("  \n".join(lines))
             
             if pd.notna(candidat_data.get('points_forts_pour_poste_annonce')):
                 st.success(f"**Points forts:** {candidat_data['points_forts_pour_poste_annonce']}")
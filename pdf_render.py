@@ -0,0 +1,40 @@
+"""Rastérisation des pages PDF, exécutable dans un processus séparé.
+
+PyMuPDF n'est pas thread-safe : le rendu parallèle passe par un pool de processus.
+Le worker doit vivre dans un module importable (le script Streamlit tourne en __main__).
+"""
+import fitz  # PyMuPDF
+import numpy as np
+
+
+JPEG_QUALITY = 80
+# Largeur de rendu : celle des panneaux d'affichage, au-delà le navigateur ne fait que réduire l'image
+RENDER_WIDTH_PX = 800
+
+
+def render_doc_page(doc, page_num, width=RENDER_WIDTH_PX):
+    """Rastérise une page d'un document déjà ouvert à la largeur `width`.
+
+    JPEG pour les pages en couleur (CV avec photo : image bien plus légère à envoyer),
+    PNG pour les pages en niveaux de gris, où le JPEG n'apporte rien et floute le texte.
+    """
+    page = doc.load_page(page_num)
+    zoom = width / page.rect.width
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    # get_pixmap rend toujours en RGB : une page est en niveaux de gris si R == G == B pour chaque pixel
+    samples = np.frombuffer(pix.samples, dtype=np.uint8).reshape(-1, pix.n)
+    if (samples == samples[:, :1]).all():
+        return fitz.Pixmap(fitz.csGRAY, pix).tobytes("png")
+    return pix.tobytes("jpeg", jpg_quality=JPEG_QUALITY)
+
+
+def render_page(path_str, page_num, width=RENDER_WIDTH_PX):
+    """Rastérise une page du PDF (chaque appel, dans un worker, ouvre son propre document)"""
+    doc = fitz.open(path_str)
+    try:
+        return render_doc_page(doc, page_num, width)
+    finally:
+        doc.close()
+        # Les workers vivent aussi longtemps que le serveur : le store MuPDF (polices, images
+        # décodées) est vidé après chaque page plutôt que de grossir à chaque CV consulté
+        fitz.TOOLS.store_shrink(100)
@@ -0,0 +1,116 @@
+import sys
+from pathlib import Path
+
+import httpx
+import pandas as pd
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("supabase")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import appTestSupabase as app  # noqa: E402
+
+SUPABASE_URL = "https://proj.supabase.co"
+SUPABASE_KEY = "header.payload.signature"
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Requêtes interceptées au niveau du transport httpx (aucun appel réseau)"""
+    requests = []
+
+    def handle_request(transport, request):
+        requests.append(request)
+        return httpx.Response(200, json=[{"id": 1}], headers={"content-range": "0-0/1"})
+
+    monkeypatch.setattr(httpx.HTTPTransport, "handle_request", handle_request)
+    return requests
+
+
+def test_fetch_rows_targets_postgrest_after_storage_is_used(sent):
+    client = app.build_supabase_client(SUPABASE_URL, SUPABASE_KEY)
+    # Storage instancié d'abord, comme le préchargement du bucket dans main()
+    client.storage
+
+    rows, total = app.fetch_rows(client, "dq_run", limit=10, count="planned")
+
+    assert rows == [{"id": 1}]
+    assert total == 1
+    url = sent[0].url
+    assert (url.scheme, url.host, url.path) == ("https", "proj.supabase.co", "/rest/v1/dq_run")
+    assert url.params["select"] == "*"
+    assert url.params["limit"] == "10"
+    assert sent[0].headers["apikey"] == SUPABASE_KEY
+    assert sent[0].headers["authorization"] == f"Bearer {SUPABASE_KEY}"
+
+
+def test_client_timeouts_are_bounded():
+    client = app.build_supabase_client(SUPABASE_URL, SUPABASE_KEY)
+
+    assert client.postgrest.session.timeout.read == app.POSTGREST_TIMEOUT_S
+    assert client.storage.session.timeout.read == app.STORAGE_TIMEOUT_S
+
+
+def test_csv_column_kinds_follow_json_types():
+    definitions = {
+        "dq_run": {"properties": {
+            "id": {"type": "integer", "format": "bigint"},
+            "ok": {"type": "boolean", "format": "boolean"},
+            "label": {"type": "string", "format": "text"},
+            "started_at": {"type": "string", "format": "timestamp with time zone"},
+            "payload": {"format": "jsonb"},
+            "tags": {"type": "array", "format": "text[]", "items": {"type": "string"}},
+        }},
+    }
+
+    assert app.csv_column_kinds(definitions) == {"dq_run": {
+        "ok": "boolean", "label": "text", "started_at": "text", "payload": "json", "tags": "json",
+    }}
+
+
+def test_fetch_frame_csv_matches_json_dtypes(monkeypatch):
+    csv_body = b'id,ok,label,started_at\n1,t,NA,2024-01-01 10:00:00+00\n2,f,"",\n3,,null,\n'
+
+    def handle_request(transport, request):
+        assert request.headers["accept"] == "text/csv"
+        return httpx.Response(200, content=csv_body)
+
+    monkeypatch.setattr(httpx.HTTPTransport, "handle_request", handle_request)
+    client = app.build_supabase_client(SUPABASE_URL, SUPABASE_KEY)
+    column_types = {"ok": "boolean", "label": "text", "started_at": "text", "absent": "text"}
+
+    df = app.fetch_frame(client, "dq_run", column_types=column_types)
+
+    assert df["id"].tolist() == [1, 2, 3]
+    assert df["ok"].tolist()[:2] == [True, False] and pd.isna(df["ok"][2])
+    # Valeurs « sales » gardées telles quelles, seul le champ vide non quoté est NULL
+    assert df["label"].tolist() == ["NA", "", "null"]
+    assert df["started_at"][0] == "2024-01-01 10:00:00+00" and pd.isna(df["started_at"][1])
+
+
+def test_fetch_frame_sends_json_tables_to_the_json_path(sent):
+    client = app.build_supabase_client(SUPABASE_URL, SUPABASE_KEY)
+
+    df = app.fetch_frame(client, "dq_run", column_types={"payload": "json"})
+
+    assert df.to_dict("records") == [{"id": 1}]
+    assert len(sent) == 1
+    assert sent[0].headers["accept"] != "text/csv"
+
+
+def test_dashboard_bundle_falls_back_to_tables_when_rpc_is_missing(monkeypatch, caplog):
+    def handle_request(transport, request):
+        if request.url.path.endswith("/rpc/dashboard_bundle"):
+            return httpx.Response(404, json={"code": "PGRST202", "message": "function not found", "details": None, "hint": None})
+        return httpx.Response(200, json=[{"table": request.url.path.rpartition("/")[2]}])
+
+    monkeypatch.setattr(httpx.HTTPTransport, "handle_request", handle_request)
+    client = app.build_supabase_client(SUPABASE_URL, SUPABASE_KEY)
+    app.load_dashboard_bundle.clear()
+
+    with caplog.at_level("WARNING", logger=app.logger.name):
+        bundle = app.load_dashboard_bundle(client)
+
+    assert bundle == {name: [{"table": name}] for name in app.DASHBOARD_TABLES}
+    assert "dashboard_bundle" in caplog.text